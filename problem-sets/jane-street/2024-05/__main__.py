@@ -1,105 +1,99 @@
 from grid_graph import GridGraph
-import math
-import copy
+from bit_grid_graph import BitGridGraph
 import networkx as nx
 import os
 from functools import lru_cache
 import multiprocessing
-from multiprocessing import Manager, Pool
+from multiprocessing import Pool
 import time
+from itertools import islice
+import numpy as np
 from prime_to_prime.prime_power_checker import PrimePowerChecker
+import number_theory
+from coloring import count_colorings, get_all_colorings
+from batch_checkers import get_batch_checker
+import row_store
+from result_cache import CACHE_DIR, ResultCache, solver_key
+from checkpoint import Checkpoint
+from progress import ProgressReporter
+from row_numbers import number_digits
+from clue_numbers import (
+    ClueTableChecker,
+    get_table_checker,
+    has_clue_candidates,
+    precompute_clue_tables,
+    segment_candidates,
+    segment_prefix_is_feasible,
+)
 
 
 def generate_masks(n):
-    def helper(current_string, length):
-        if length == n:
-            yield current_string
-        else:
-            if not current_string or current_string[-1] == "0":
-                yield from helper(current_string + "1", length + 1)
-            yield from helper(current_string + "0", length + 1)
+    """All sparse masks of width n as ints (bit c set = column c shaded).
 
-    return helper("", 0)
+    Sparse means no two adjacent bits, i.e. m & (m >> 1) == 0; there are
+    233 of them for n = 11.
+    """
+    return [m for m in range(1 << n) if m & (m >> 1) == 0]
 
 
-def get_all_colorings(graph: nx.Graph, m, initial_colors=None):
-    def is_valid(graph: nx.Graph, color, node, c):
-        for neighbor in graph.neighbors(node):
-            if color[neighbor] == c:
-                return False
-        return True
+def mask_to_string(mask, n):
+    return "".join("1" if mask >> c & 1 else "0" for c in range(n))
 
-    def graph_coloring(graph: nx.Graph, m, color, node):
-        if node == len(graph):
-            yield color.copy()
-            return
 
-        nodes = list(graph.nodes())
-        current_node = nodes[node]
+def mask_from_string(mask_string):
+    return sum(1 << c for c, char in enumerate(mask_string) if char == "1")
 
-        if color[current_node] is not None:
-            yield from graph_coloring(graph, m, color, node + 1)
-            return
 
-        for c in range(m):
-            if is_valid(graph, color, current_node, c):
-                color[current_node] = c
-                yield from graph_coloring(graph, m, color, node + 1)
-                color[current_node] = None
+def row_to_mask(row):
+    mask = 0
+    for c, value in enumerate(row):
+        if value == 10:
+            mask |= 1 << c
+    return mask
 
-    color = {node: None for node in graph.nodes()}
-    if initial_colors:
-        color.update(initial_colors)
 
-    return graph_coloring(graph, m, color, 0)
+def get_mask_compatibility(masks):
+    """mask -> set of masks that may be directly below it (no shaded cells
+    share a column)."""
+    return {a: frozenset(b for b in masks if a & b == 0) for a in masks}
 
 
-@lru_cache(None)
 def is_square(n):
-    if n < 0:
-        return False
-    sqrt_n = int(math.sqrt(n))
-    return sqrt_n * sqrt_n == n
+    return number_theory.is_square(n)
 
 
 # @lru_cache(None)
 def is_palindrome(num):
-    s = str(num)
-    return s == s[::-1]
+    if num < 0:
+        return False
+    return digits_are_palindrome(number_digits(num))
+
+
+# Digit based clues, written on digit tuples so a row's segments can be
+# checked on the digits they already have.
+def digits_are_palindrome(digits):
+    return digits == digits[::-1]
+
+
+def digits_sum_to_7(digits):
+    return sum(digits) == 7
+
+
+def product_of_digits_ends_in_1(digits):
+    product = 1
+    for digit in digits:
+        product = product * digit % 10
+    return product == 1
 
 
-@lru_cache(None)
 def is_prime(num):
     """Helper function to check if a number is prime."""
-    if num <= 1:
-        return False
-    if num <= 3:
-        return True
-    if num % 2 == 0 or num % 3 == 0:
-        return False
-    i = 5
-    while i * i <= num:
-        if num % i == 0 or num % (i + 2) == 0:
-            return False
-        i += 6
-    return True
+    return number_theory.is_prime(num)
 
 
-@lru_cache(None)
 def is_prime_raised_to_prime_power(num):
     """Check if a number is a prime raised to a prime power."""
-    for base in range(2, int(math.sqrt(num)) + 1):
-        if is_prime(base):
-            power = 1
-            while True:
-                num_to_check = base**power
-                if is_prime(power):
-                    if num_to_check == num:
-                        return True
-                if num_to_check > num:
-                    break
-                power += 1
-    return False
+    return number_theory.is_prime_power(num)
 
 
 prime_power_checker = PrimePowerChecker()
@@ -113,20 +107,12 @@ def is_prime_raised_to_prime_power2(num):
 @lru_cache(None)
 def is_digits_sum_to_7(num):
     """Check if the sum of the digits of a number is 7."""
-    return sum(int(digit) for digit in str(num)) == 7
+    return digits_sum_to_7(number_digits(num))
 
 
-@lru_cache(None)
 def is_fibonacci(num):
     """Check if a number is a Fibonacci number."""
-
-    def is_perfect_square(x):
-        s = int(math.sqrt(x))
-        return s * s == x
-
-    return is_perfect_square(5 * num * num + 4) or is_perfect_square(
-        5 * num * num - 4
-    )
+    return number_theory.is_fibonacci(num)
 
 
 @lru_cache(None)
@@ -144,10 +130,7 @@ def is_palindrome_and_multiple_of_23(num):
 @lru_cache(None)
 def is_product_of_digits_end_in_1(num):
     """Check if the product of the digits of a number ends in 1."""
-    product = 1
-    for digit in str(num):
-        product *= int(digit)
-    return str(product).endswith("1")
+    return product_of_digits_ends_in_1(number_digits(num))
 
 
 @lru_cache(None)
@@ -167,187 +150,706 @@ def is_one_more_than_palindrome(num):
     return is_palindrome(num - 1)
 
 
-def get_row_array(row_graph: GridGraph, row_length):
-    array = []
-    for c in range(row_length):
-        array.append(row_graph.get_cell_data((0, c)))
-    return array
+# Clue id -> scalar checker, so workers can be handed a name instead of a
+# pickled function.
+ROW_RULE_CHECKERS = {
+    checker.__name__: checker
+    for checker in [
+        is_square,
+        is_one_more_than_palindrome,
+        is_prime_raised_to_prime_power,
+        is_prime_raised_to_prime_power2,
+        is_digits_sum_to_7,
+        is_fibonacci,
+        is_multiple_of_37,
+        is_palindrome_and_multiple_of_23,
+        is_product_of_digits_end_in_1,
+        is_multiple_of_88,
+        is_one_less_than_palindrome,
+    ]
+}
+
+
+def get_row_rule_checker(clue, use_clue_table=False):
+    checker = ROW_RULE_CHECKERS[clue]
+    return get_table_checker(checker) if use_clue_table else checker
+
+
+# Clue id -> checker taking (number, digits) for the clues that are about
+# digits. Other clues ignore the digits.
+SEGMENT_CHECKERS = {
+    "is_digits_sum_to_7": lambda num, digits: digits_sum_to_7(digits),
+    "is_palindrome_and_multiple_of_23": lambda num, digits: (
+        num % 23 == 0 and digits_are_palindrome(digits)
+    ),
+    "is_product_of_digits_end_in_1": lambda num, digits: (
+        product_of_digits_ends_in_1(digits)
+    ),
+}
 
 
-def get_row_numbers(row_array):
-    result = []
-    current_number = ""
+def get_segment_checker(checker):
+    """(number, digits) checker for a row rule checker."""
+    segment_checker = SEGMENT_CHECKERS.get(checker.__name__)
+    if segment_checker is not None:
+        return segment_checker
+    return lambda num, digits: checker(num)
 
-    for num in row_array:
-        if num == 10:
-            if current_number:
-                result.append(int(current_number))
-                current_number = ""
+
+def get_row_segments(masked_graph: GridGraph, region_graph, row_length):
+    """Split the unshaded cells of row 0 into segments of region runs.
+
+    Each segment is a list of [region, run_length] pairs, left to right.
+    """
+    region_of = {
+        cell: node
+        for node, data in region_graph.nodes(data=True)
+        for cell in data["cells"]
+    }
+    segments = []
+    segment = []
+    for c in range(row_length):
+        if masked_graph.get_cell_data((0, c)) == 10:
+            if segment:
+                segments.append(segment)
+                segment = []
+            continue
+        region = region_of[(0, c)]
+        if segment and segment[-1][0] == region:
+            segment[-1][1] += 1
         else:
-            current_number += str(num)
+            segment.append([region, 1])
+    if segment:
+        segments.append(segment)
+    return segments, region_of
+
+
+def get_clue_driven_rows(
+    masked_graph: GridGraph, region_graph: nx.Graph, clue, row_length
+):
+    """Yield valid row arrays by enumerating clue numbers per segment.
+
+    Instead of coloring the region graph and checking the numbers
+    afterwards, every unshaded segment takes its digits from the numbers
+    that satisfy the clue, and only the region/adjacency constraints are
+    checked. The work scales with the number of valid numbers.
+    """
+    segments, region_of = get_row_segments(
+        masked_graph, region_graph, row_length
+    )
+    color = masked_graph.get_region_coloring(region_graph)
+
+    def assign(segment_index):
+        if segment_index == len(segments):
+            yield [color[region_of[(0, c)]] for c in range(row_length)]
+            return
+
+        segment = segments[segment_index]
+        runs = tuple(run_length for _, run_length in segment)
+        for digits in segment_candidates(clue, runs):
+            assigned = []
+            is_valid = True
+            for (region, _), digit in zip(segment, digits):
+                if color[region] is None:
+                    if any(
+                        color[neighbor] == digit
+                        for neighbor in region_graph.neighbors(region)
+                    ):
+                        is_valid = False
+                        break
+                    color[region] = digit
+                    assigned.append(region)
+                elif color[region] != digit:
+                    is_valid = False
+                    break
+            if is_valid:
+                yield from assign(segment_index + 1)
+            for region in assigned:
+                color[region] = None
 
-    if current_number:  # Append the last number if exists
-        result.append(int(current_number))
+    return assign(0)
 
-    return result
 
+def get_pruned_row_colorings(
+    masked_graph: GridGraph,
+    region_graph: nx.Graph,
+    row_rule_checker,
+    row_length,
+):
+    """Yield colorings of the visible regions whose row numbers can satisfy
+    the clue.
+
+    Only the regions returned by get_visible_regions are colored, so every
+    distinct row is produced once; count_represented_colorings gives the
+    number of full colorings behind it.
 
-def all_numbers_pass_checker(array, checker):
-    for num in array:
-        if checker(num) is False:
+    Regions are colored in left-to-right cell order, so every segment is
+    filled from its leading digit on. After each assignment the partially
+    known segment is checked against the clue (leading zero, digit sum
+    bound, residue, table prefix) and infeasible subtrees are cut.
+    """
+    segments, _ = get_row_segments(masked_graph, region_graph, row_length)
+    if any(sum(length for _, length in segment) < 2 for segment in segments):
+        return iter(())
+
+    clue = row_rule_checker.__name__
+    segment_of = {}
+    for index, segment in enumerate(segments):
+        for region, _ in segment:
+            segment_of[region] = index
+    runs = [tuple(length for _, length in segment) for segment in segments]
+    initial_colors = masked_graph.get_region_coloring(region_graph)
+    visible = get_visible_regions(region_graph, initial_colors)
+    node_order = [region for segment in segments for region, _ in segment]
+    node_order += [node for node in visible if node not in segment_of]
+
+    def predicate(color, node):
+        index = segment_of.get(node)
+        if index is None:
+            return True
+        digits = []
+        for region, _ in segments[index]:
+            if color[region] is None:
+                break
+            digits.append(color[region])
+        if not segment_prefix_is_feasible(clue, runs[index], digits):
+            return False
+        if len(digits) == len(runs[index]) and not has_clue_candidates(clue):
+            number = 0
+            for run_length, digit in zip(runs[index], digits):
+                for _ in range(run_length):
+                    number = 10 * number + digit
+            return row_rule_checker(number)
+        return True
+
+    return get_all_colorings(
+        region_graph.subgraph(visible),
+        10,
+        initial_colors={node: initial_colors[node] for node in visible},
+        partial_predicate=predicate,
+        node_order=list(dict.fromkeys(node_order)),
+    )
+
+
+def get_visible_regions(region_graph: nx.Graph, initial_colors):
+    """Regions with a cell in row 0 or an already fixed color.
+
+    Colorings that only differ elsewhere give the same row, so the other
+    regions are counted instead of enumerated. They only exist in
+    multi-row subsets.
+    """
+    return [
+        node
+        for node, data in region_graph.nodes(data=True)
+        if initial_colors[node] is not None
+        or any(r == 0 for r, _ in data["cells"])
+    ]
+
+
+def count_represented_colorings(region_graph: nx.Graph, color):
+    """Number of full colorings of region_graph that extend a coloring of
+    its visible regions (0 if the rest cannot be colored)."""
+    if len(color) == region_graph.number_of_nodes():
+        return 1
+    return count_colorings(region_graph, 10, initial_colors=color)
+
+
+def get_batched_valid_rows(
+    masked_graph: GridGraph,
+    region_graph: nx.Graph,
+    colors_iter,
+    row_rule_checker,
+    row_length,
+    batch_size=4096,
+):
+    """Check colorings in batches with the vectorized row checkers.
+
+    Returns (valid_rows, number of colorings checked, number of full
+    colorings the valid rows stand for).
+    """
+    batch_checker = get_batch_checker(row_rule_checker)
+    projection = masked_graph.get_row_projection(region_graph)
+    nodes = list(dict.fromkeys(projection.nodes))
+    position = {node: i for i, node in enumerate(nodes)}
+    region_index = np.array(
+        [position[node] for node in projection.nodes], dtype=np.intp
+    )
+
+    bounds = [
+        (start, end, np.array(place_values, dtype=np.int64))
+        for start, end, place_values in projection.layout
+    ]
+
+    valid_rows = []
+    colors_done = 0
+    colorings = 0
+    while True:
+        batch = list(islice(colors_iter, batch_size))
+        if not batch:
+            break
+        colors_done += len(batch)
+        colors = np.array(
+            [[color[node] for node in nodes] for color in batch],
+            dtype=np.int64,
+        )
+        rows = colors[:, region_index]
+        is_valid = np.ones(len(rows), dtype=bool)
+        for start, end, place_values in bounds:
+            digits = rows[:, start:end]
+            is_valid &= batch_checker(digits @ place_values, digits)
+        for k in np.flatnonzero(is_valid):
+            count = count_represented_colorings(region_graph, batch[k])
+            if count:
+                valid_rows.append(rows[k].tolist())
+                colorings += count
+
+    return valid_rows, colors_done, colorings
+
+
+def all_segments_pass_checker(segments, segment_checker):
+    for num, digits in segments:
+        if not segment_checker(num, digits):
             return False
     return True
 
 
-class CompletedCounter:
-    def __init__(self, manager):
-        self.count = manager.Value("i", 0)
-        self.lock = manager.Lock()
+def get_first_region(masked_graph: GridGraph, region_graph, row_length):
+    """Node of the region holding the leftmost unshaded cell of row 0."""
+    segments, _ = get_row_segments(masked_graph, region_graph, row_length)
+    return segments[0][0][0] if segments else None
+
 
-    def increment(self):
-        with self.lock:
-            self.count.value += 1
+def task_name(mask, first_color, row_length):
+    name = mask_to_string(mask, row_length)
+    return name if first_color is None else f"{name}/{first_color}"
 
 
-def process_mask(args):
+def schedule_masks(
+    row_graph: GridGraph, masks, row_rule_checker, row_length, split_regions=7
+):
+    """Order (mask, first_color) tasks most expensive first.
+
+    The cost of a mask is estimated from the number of unshaded regions
+    left after masking (~9**regions colorings). Masks with at least
+    split_regions regions are split into one task per feasible color of
+    their first region, so a single heavy mask cannot keep one core busy
+    while the others idle.
+    """
+    clue = row_rule_checker.__name__
+    tasks = []
+    for mask in masks:
+        masked_graph = row_graph.custom_copy()
+        masked_graph.apply_mask([mask])
+        region_graph = masked_graph.find_region_adjacency()
+        segments, _ = get_row_segments(masked_graph, region_graph, row_length)
+        num_regions = sum(len(segment) for segment in segments)
+        cost = 9**num_regions
+        if num_regions < split_regions or not segments:
+            tasks.append((cost, mask, None))
+            continue
+        first_runs = [length for _, length in segments[0]]
+        first_colors = [
+            c
+            for c in range(10)
+            if segment_prefix_is_feasible(clue, first_runs, [c])
+        ]
+        for c in first_colors:
+            tasks.append((cost / len(first_colors), mask, c))
+    tasks.sort(key=lambda task: task[0], reverse=True)
+    return [(mask, first_color) for _, mask, first_color in tasks]
+
+
+# Row being solved, set once per worker by init_row_worker.
+row_context = {}
+
+
+def init_row_worker(row_graph, clue, use_clue_table, row_length, strategy):
+    """Pool initializer: receive the shared row context once per worker."""
+    row_context["row_graph"] = row_graph
+    row_context["row_rule_checker"] = get_row_rule_checker(
+        clue, use_clue_table
+    )
+    row_context["row_length"] = row_length
+    row_context["strategy"] = strategy
+
+
+def get_row_context_args(row_graph, row_rule_checker, row_length, strategy):
+    return (
+        row_graph,
+        row_rule_checker.__name__,
+        isinstance(row_rule_checker, ClueTableChecker),
+        row_length,
+        strategy,
+    )
+
+
+def process_mask(task):
+    """Solve one (mask, first_color) task of the row in row_context.
+
+    Returns (task name, packed valid rows, stats). With first_color set
+    only the colorings whose first region has that color are solved.
+    Workers never touch the row file; the parent is the single writer.
+    """
     start_time = time.time()
-    file_name, mask, row_graph, row_rule_checker, row_length, counter = args
-    masked_graph: GridGraph = copy.deepcopy(row_graph)
+    mask, first_color = task
+    row_graph = row_context["row_graph"]
+    row_rule_checker = row_context["row_rule_checker"]
+    row_length = row_context["row_length"]
+    strategy = row_context["strategy"]
+    masked_graph: GridGraph = row_graph.custom_copy()
     masked_graph.apply_mask([mask])
+    # Coloring a region leaves the links alone, so the region graph stays
+    # valid after the first region is pre-colored.
     region_graph = masked_graph.find_region_adjacency()
-    initial_colors = masked_graph.get_region_coloring(region_graph)
-    colors_iter = get_all_colorings(
-        region_graph, 10, initial_colors=initial_colors
-    )
+    if first_color is not None:
+        first_region = get_first_region(masked_graph, region_graph, row_length)
+        masked_graph.set_region_data(
+            region_graph.nodes[first_region]["cells"], first_color
+        )
 
-    valid_rows = []
-    deepcopy_time = 0
-    # color_end = time.time()
-    # color_sum = 0
-    # num_check_sum = 0
-    for colors_done, color in enumerate(colors_iter):
-        # color_start = time.time()
-        # color_sum += color_start - color_end
-        # print(
-        #     f"#{colors_done}\tcolor t: {color_sum}\t"
-        #     f"num_check t: {num_check_sum}",
-        #     end="\r",
-        # )
-        deep_copy_start = time.time()
-        color_graph = masked_graph.custom_copy()
-        deep_copy_end = time.time()
-        deepcopy_time += deep_copy_end - deep_copy_start
-        for node, value in color.items():
-            color_graph.set_region_data(
-                region_graph.nodes[node]["cells"], value
-            )
-        row_array = get_row_array(color_graph, row_length)
-        row_numbers = get_row_numbers(row_array)
-        # num_check_start = time.time()
-        if all_numbers_pass_checker(row_numbers, row_rule_checker):
-            valid_rows.append(row_array)
-        # color_end = time.time()
-        # num_check_sum += color_end - num_check_start
-
-    with counter.lock:
-        with open(file_name, "a") as file:
-            for row_array in valid_rows:
-                file.write(f"{row_array}\n")
-
-    counter.increment()
-    end_time = time.time()
-
-    print(
+    stats = {}
+    clue = row_rule_checker.__name__
+    if strategy == "clue" and has_clue_candidates(clue):
+        valid_rows = list(
+            get_clue_driven_rows(masked_graph, region_graph, clue, row_length)
+        )
+    elif strategy == "batch":
+        colors_iter = get_pruned_row_colorings(
+            masked_graph, region_graph, row_rule_checker, row_length
+        )
         (
-            f"Completed masks: {counter.count.value}\t"
-            f"mask: {mask}\tnum_of_colors: {colors_done+1}\t"
-            f"Time: {end_time-start_time} s \t"
-            f"DeepT {deepcopy_time} s "
+            valid_rows,
+            stats["num_of_colors"],
+            stats["num_of_colorings"],
+        ) = get_batched_valid_rows(
+            masked_graph,
+            region_graph,
+            colors_iter,
+            row_rule_checker,
+            row_length,
         )
-    )
+    else:
+        colors_iter = get_pruned_row_colorings(
+            masked_graph, region_graph, row_rule_checker, row_length
+        )
+        projection = masked_graph.get_row_projection(region_graph)
+        segment_checker = get_segment_checker(row_rule_checker)
+        valid_rows = []
+        colors_done = 0
+        colorings = 0
+        for color in colors_iter:
+            colors_done += 1
+            segments = projection.segments(color)
+            if not all_segments_pass_checker(segments, segment_checker):
+                continue
+            count = count_represented_colorings(region_graph, color)
+            if count:
+                valid_rows.append(projection.row(color))
+                colorings += count
+        stats["num_of_colors"] = colors_done
+        stats["num_of_colorings"] = colorings
+
+    stats["num_of_rows"] = len(valid_rows)
+    stats["time"] = time.time() - start_time
+    name = task_name(mask, first_color, row_length)
+    return name, row_store.rows_to_bytes(valid_rows), stats
+
+
+def append_results(file_name, results, progress: ProgressReporter):
+    """Append the rows of every (mask, row bytes, stats) result to the row
+    file as it arrives."""
+    with open(file_name, "ab") as file:
+        for mask, row_bytes, stats in results:
+            file.write(row_bytes)
+            progress.update(mask, stats)
+
+
+def write_results(
+    results, progress: ProgressReporter, checkpoint: Checkpoint, cache=None
+):
+    """Store the rows of every (mask, row bytes, stats) result in the
+    checkpoint as it arrives, from this process only, and in cache if
+    given."""
+    for mask, row_bytes, stats in results:
+        checkpoint.add(mask, row_bytes)
+        if cache is not None:
+            cache.put(mask, row_bytes)
+        progress.update(mask, stats)
+
+
+def get_cached_results(tasks, cache: ResultCache, row_length):
+    """Split tasks into results found in cache and tasks left to solve."""
+    cached = []
+    remaining = []
+    for task in tasks:
+        name = task_name(*task, row_length)
+        row_bytes = cache.get(name)
+        if row_bytes is None:
+            remaining.append(task)
+        else:
+            cached.append((name, row_bytes, {"cached": 1}))
+    return cached, remaining
 
 
 def solve_row_single_core(
-    file_name, row_graph, row_rule_checker, row_length, num_processes=None
+    file_name,
+    row_graph,
+    row_rule_checker,
+    row_length,
+    num_processes=None,
+    strategy="coloring",
 ):
     # masks = list(generate_masks(row_length))
-    masks = ["00000100100"]
-    # masks = ["00000000000"]
-    with Manager() as manager:
-        counter = CompletedCounter(manager)
-        for mask in masks:
-            args = (
-                file_name,
-                mask,
-                row_graph,
-                row_rule_checker,
-                row_length,
-                counter,
-            )
-            process_mask(args)
+    masks = [mask_from_string("00000100100")]
+    # masks = [mask_from_string("00000000000")]
+    init_row_worker(
+        *get_row_context_args(
+            row_graph, row_rule_checker, row_length, strategy
+        )
+    )
+    tasks = [(mask, None) for mask in masks]
+    with ProgressReporter(len(tasks), min_interval=0) as progress:
+        append_results(file_name, map(process_mask, tasks), progress)
 
     print(f"Processed {len(masks)} masks")
 
 
 def solve_row(
-    file_name, row_graph, row_rule_checker, row_length, num_processes=None
+    file_name,
+    row_graph,
+    row_rule_checker,
+    row_length,
+    num_processes=None,
+    strategy="coloring",
+    stats_file=None,
+    cache_dir=None,
+    resume=False,
 ):
-    masks = list(generate_masks(row_length))
-    with Manager() as manager:
-        counter = CompletedCounter(manager)
+    """Solve every mask of a row and write the valid rows to file_name.
 
-        if num_processes is None:
-            num_processes = multiprocessing.cpu_count()
+    Results are checkpointed in file_name.parts/ as they arrive and merged
+    into file_name at the end. With resume=True the tasks an interrupted
+    run already finished are taken from there instead of being solved.
+    """
+    masks = generate_masks(row_length)
+    # Build the region partition once; every worker copy then only updates
+    # the regions its mask touches.
+    row_graph.find_all_regions()
+
+    if num_processes is None:
+        num_processes = multiprocessing.cpu_count()
+
+    tasks = schedule_masks(row_graph, masks, row_rule_checker, row_length)
+    names = [task_name(*task, row_length) for task in tasks]
+    checkpoint = Checkpoint(
+        f"{file_name}.parts",
+        row_length,
+        solver_key(row_graph, row_rule_checker.__name__, row_length),
+        resume,
+    )
+    cache = None
+    if cache_dir is not None:
+        cache = ResultCache(
+            row_graph, row_rule_checker.__name__, row_length, cache_dir
+        )
 
-        with Pool(processes=num_processes) as pool:
-            args = [
-                (
-                    file_name,
-                    mask,
-                    row_graph,
-                    row_rule_checker,
-                    row_length,
-                    counter,
-                )
-                for mask in masks
-            ]
-            pool.map(process_mask, args)
+    with ProgressReporter(
+        len(tasks), label=file_name, stats_file=stats_file
+    ) as progress:
+        for name in names:
+            if name in checkpoint.completed:
+                progress.update(name, {"resumed": 1})
+        tasks = [
+            task
+            for task, name in zip(tasks, names)
+            if name not in checkpoint.completed
+        ]
+        if cache is not None:
+            cached, tasks = get_cached_results(tasks, cache, row_length)
+            write_results(cached, progress, checkpoint)
+        # The graph and checker go to each worker once through the
+        # initializer; a task is only the (mask, first_color) pair.
+        with Pool(
+            processes=num_processes,
+            initializer=init_row_worker,
+            initargs=get_row_context_args(
+                row_graph, row_rule_checker, row_length, strategy
+            ),
+        ) as pool:
+            write_results(
+                pool.imap_unordered(process_mask, tasks),
+                progress,
+                checkpoint,
+                cache,
+            )
+    checkpoint.merge(file_name, names)
 
     print(f"Processed {len(masks)} masks")
 
 
-def are_blacks_sparse(array_of_rows):
-    # expects array of length two. objects in a array are equal length arrays.
-    # Initialize a set to keep track of positions where the value is found
-    positions = set()
-    for row in array_of_rows:
-        for idx, element in enumerate(row):
-            if element == 10:  # 10 represents black
-                if idx in positions:
-                    return False  # Value found in the same position
-                positions.add(idx)
-    return True
+def read_file_generator(file_path):
+    """Yields each record of a row file as a list of integers (a list of
+    rows for combined files).
+    """
+    for record in row_store.load_rows(file_path):
+        yield record.tolist()
 
 
-def read_file_generator(file_path):
-    """Reads a file line by line and yields each line as a list of integers."""
-    with open(file_path, "r") as file:
-        for line in file:
-            yield list(map(int, line.strip().split(",")))
+@lru_cache(None)
+def mask_columns(mask):
+    return tuple(c for c in range(mask.bit_length()) if mask >> c & 1)
+
+
+def get_linked_columns(graph, r, row_length):
+    """Bit mask of the columns whose cells in rows r and r + 1 are linked,
+    i.e. whose region crosses the row boundary."""
+    linked = 0
+    for c in range(row_length):
+        if (r + 1, c) in graph.neighbors((r, c)):
+            linked |= 1 << c
+    return linked
 
 
-def generate_combinations(file1_path, file2_path):
-    """Generates all combinations of selecting one row from each file in
-    a streaming manner.
+class RowJoin:
+    """Joins candidate rows for row r + 1 onto candidate rows for row r.
+
+    Bottom rows are grouped by shading mask, and each group is bucketed by
+    its digits at the linked columns left unshaded, so a top row only
+    visits bottom rows that share its region digits across the boundary.
+    Buckets are built lazily per (bottom mask, key columns).
+
+    The constraints between two rows are local: unshaded linked cells hold
+    the same digit and unshaded unlinked cells hold different digits. A
+    probe applies both, so a joined pair needs no further region check.
+    """
+
+    def __init__(self, bottom_rows, linked, compatibility, row_length):
+        self.linked = linked
+        self.compatibility = compatibility
+        self.full_mask = (1 << row_length) - 1
+        self.rows_by_mask = {}
+        for row in bottom_rows:
+            self.rows_by_mask.setdefault(row_to_mask(row), []).append(row)
+        self.buckets = {}
+
+    def _bucket(self, mask, key_mask):
+        bucket = self.buckets.get((mask, key_mask))
+        if bucket is None:
+            columns = mask_columns(key_mask)
+            bucket = {}
+            for row in self.rows_by_mask[mask]:
+                key = tuple(row[c] for c in columns)
+                bucket.setdefault(key, []).append(row)
+            self.buckets[(mask, key_mask)] = bucket
+        return bucket
+
+    def probe(self, top_row):
+        """Yields the bottom rows that may sit directly below top_row."""
+        top_mask = row_to_mask(top_row)
+        for mask in self.compatibility[top_mask]:
+            if mask not in self.rows_by_mask:
+                continue
+            open_mask = self.full_mask & ~(top_mask | mask)
+            key_mask = open_mask & self.linked
+            key = tuple(top_row[c] for c in mask_columns(key_mask))
+            distinct = mask_columns(open_mask & ~self.linked)
+            for row in self._bucket(mask, key_mask).get(key, ()):
+                if all(top_row[c] != row[c] for c in distinct):
+                    yield row
+
+
+def advance_frontier(
+    frontier,
+    file_bottom,
+    linked,
+    compatibility,
+    row_length,
+    keep_parents=True,
+):
+    """One transfer step of the row-by-row dynamic program.
+
+    A frontier maps each possible last row (as a tuple) to [count,
+    parents]: the number of valid partial grids ending in that row and,
+    with keep_parents, the rows of the previous frontier it was reached
+    from (None otherwise). Since every constraint between rows only
+    involves vertically adjacent cells, the last row is the whole state:
+    its shading and digits decide which rows may follow, and regions
+    closed further up can no longer be affected. Partial grids ending in
+    the same row are merged into one entry, so the counts take memory per
+    distinct frontier; back-pointers take one per row-to-row transition.
+    """
+    join = RowJoin(
+        read_file_generator(file_bottom), linked, compatibility, row_length
+    )
+    next_frontier = {}
+    for state, (count, _) in frontier.items():
+        for row in join.probe(state):
+            row = tuple(row)
+            entry = next_frontier.get(row)
+            if entry is None:
+                entry = next_frontier[row] = [0, [] if keep_parents else None]
+            entry[0] += count
+            if keep_parents:
+                entry[1].append(state)
+    return next_frontier
+
+
+def solve_frontiers(
+    graph, row_files, first_row, row_length, keep_parents=True
+):
+    """Runs the dynamic program over consecutive row files and yields the
+    frontier after each row.
+
+    Only the current frontier is held here; callers that want the grids
+    themselves keep every frontier (with keep_parents) for
+    frontier_solutions.
     """
-    file1_gen = read_file_generator(file1_path)
-    file2_gen = list(
-        read_file_generator(file2_path)
-    )  # Convert the second file to a list to iterate multiple times
+    compatibility = get_mask_compatibility(generate_masks(row_length))
+    frontier = {
+        tuple(row): [1, [] if keep_parents else None]
+        for row in read_file_generator(row_files[0])
+    }
+    yield frontier
+    for i, file_bottom in enumerate(row_files[1:]):
+        linked = get_linked_columns(graph, first_row + i, row_length)
+        frontier = advance_frontier(
+            frontier,
+            file_bottom,
+            linked,
+            compatibility,
+            row_length,
+            keep_parents,
+        )
+        yield frontier
+
+
+def frontier_solutions(frontiers):
+    """Yields every full grid (a list of rows) by following back-pointers
+    from the last frontier."""
+
+    def walk(depth, state, rows):
+        rows = [state] + rows
+        if depth == 0:
+            yield rows
+            return
+        for parent in frontiers[depth][state][1]:
+            yield from walk(depth - 1, parent, rows)
 
-    for row1 in file1_gen:
-        for row2 in file2_gen:
-            yield (row1, row2)
+    for state in frontiers[-1]:
+        yield from walk(len(frontiers) - 1, state, [])
+
+
+def write_frontier_solutions(file_name, frontiers, first_row, row_length):
+    row_store.create_row_file(
+        file_name, first_row, row_length, height=len(frontiers)
+    )
+    records = []
+    for solution in frontier_solutions(frontiers):
+        records.append([v for row in solution for v in row])
+        if len(records) >= 4096:
+            row_store.append_rows(file_name, records)
+            records = []
+    row_store.append_rows(file_name, records)
 
 
 if __name__ == "__main__":
@@ -355,11 +857,24 @@ if __name__ == "__main__":
     solve_rows = True
     solve_row_range = range(3, 4)  # max 11
     combine_rows = False
-    combine_row_range = range(0)  # max 10
+    combine_row_range = range(0, 10)  # joins row r onto r + 1, max 10
+    write_solutions = True  # keep back-pointers and write every grid
     use_multi_core = True
+    strategy = "clue"  # "clue", "batch" or "coloring"
+    use_bit_grid_graph = False
+    use_clue_tables = True
+    number_cache_size = 1 << 16
+    write_stats = False  # per-mask JSON lines in solution/rowN_stats.jsonl
+    use_result_cache = True  # reuse solved masks from row_cache/
+    resume = False  # keep masks finished by an interrupted solve_row run
+
+    number_theory.set_cache_size(number_cache_size)
 
     # load base graph
-    grid_graph = GridGraph(filename="graph11.txt")
+    if use_bit_grid_graph:
+        grid_graph = BitGridGraph(filename="graph11.txt")
+    else:
+        grid_graph = GridGraph(filename="graph11.txt")
 
     # row rule checkers
     row_rule_checkers = [
@@ -375,55 +890,70 @@ if __name__ == "__main__":
         is_multiple_of_88,
         is_one_less_than_palindrome,
     ]
+    if use_clue_tables:
+        # Built (or loaded) once here so forked workers inherit the tables.
+        precompute_clue_tables(
+            {checker.__name__ for checker in row_rule_checkers}, 11
+        )
+        row_rule_checkers = [
+            get_table_checker(checker, 11) for checker in row_rule_checkers
+        ]
 
     # solve rows
     if solve_rows:
         for r in solve_row_range:
             os.makedirs("solution", exist_ok=True)
-            file_name = f"solution/row{r}.txt"
-            with open(file_name, "w") as file:
-                file.write("")  # clear file
+            file_name = f"solution/row{r}.bin"
+            row_store.create_row_file(file_name, r, 11)
 
             row_graph = grid_graph.create_subset((r, 0), 1, 11)
             rule_checker = row_rule_checkers[r]
             if use_multi_core:
-                solve_row(file_name, row_graph, rule_checker, 11)
+                solve_row(
+                    file_name,
+                    row_graph,
+                    rule_checker,
+                    11,
+                    strategy=strategy,
+                    stats_file=(
+                        f"solution/row{r}_stats.jsonl" if write_stats else None
+                    ),
+                    cache_dir=CACHE_DIR if use_result_cache else None,
+                    resume=resume,
+                )
             else:
-                solve_row_single_core(file_name, row_graph, rule_checker, 11)
+                solve_row_single_core(
+                    file_name,
+                    row_graph,
+                    rule_checker,
+                    11,
+                    strategy=strategy,
+                )
 
             print(f"Row {r}: complete")
 
     # combine rows
     if combine_rows:
-        for r in combine_row_range:
-            os.makedirs("solution", exist_ok=True)
-            file_name = f"solution/combine{r+1}.txt"
-            with open(file_name, "w") as file:
-                file.write("")  # clear file
-            if r == 0:
-                file_top = f"solution/row{r}.txt"
-                file_bottom = f"solution/row{r+1}.txt"
-            else:
-                file_top = f"solution/combine{r}.txt"
-                file_bottom = f"solution/row{r+1}.txt"
-            combinations = generate_combinations(file_top, file_bottom)
-            sub_graph: GridGraph = grid_graph.create_subset((0, 0), r + 1, 11)
-            # Print combinations
-            for combo in combinations:
-                top, bot = combo
-                if r == 0:
-                    potential_solution = [top, bot]
-                else:
-                    potential_solution = top.append(bot)
-                if not are_blacks_sparse(potential_solution[-2:]):
-                    continue
-                test_graph = copy.deepcopy(sub_graph)
-                for r, row in enumerate(potential_solution):
-                    for c, data in enumerate(row):
-                        test_graph.set_cell_data((r, c), data)
-
-                if test_graph.region_data_is_okay:
-                    with open(file_name, "a") as file:
-                        file.write(f"{potential_solution}\n")
-
-                print(combo)
+        os.makedirs("solution", exist_ok=True)
+        first_row = combine_row_range.start
+        last_row = combine_row_range.stop
+        row_files = [
+            f"solution/row{r}.bin" for r in range(first_row, last_row + 1)
+        ]
+        frontiers = []
+        for r, frontier in zip(
+            range(first_row, last_row + 1),
+            solve_frontiers(
+                grid_graph, row_files, first_row, 11, write_solutions
+            ),
+        ):
+            count = sum(entry[0] for entry in frontier.values())
+            print(f"Row {r}: {len(frontier)} frontiers, {count} grids")
+            if write_solutions:
+                frontiers.append(frontier)
+
+        if write_solutions:
+            write_frontier_solutions(
+                f"solution/combine{last_row}.bin", frontiers, first_row, 11
+            )
+            print(f"Combine {last_row}: complete")
@@ -0,0 +1,141 @@
+import numpy as np
+
+from prime_to_prime.prime_power_checker import PrimePowerChecker
+
+# Batch variants of the row checkers in __main__.py. Each takes an int64
+# array of numbers with the same digit count and their digit matrix (one
+# row per number, most significant digit first) and returns a boolean mask.
+
+
+def digit_matrix(nums, width):
+    """Digits of nums, most significant first, padded to width."""
+    powers = 10 ** np.arange(width - 1, -1, -1, dtype=np.int64)
+    return (nums[:, None] // powers) % 10
+
+
+def number_lengths(nums):
+    lengths = np.ones(len(nums), dtype=np.int64)
+    power = 10
+    while True:
+        longer = nums >= power
+        if not longer.any():
+            return lengths
+        lengths += longer
+        power *= 10
+
+
+def _is_palindrome_number_many(nums):
+    """Palindrome test for numbers of mixed length (e.g. after +1/-1)."""
+    lengths = number_lengths(nums)
+    width = int(lengths.max()) if len(nums) else 1
+    digits = digit_matrix(nums, width)
+    # right align the reversed number against its leading digit
+    offset = width - lengths
+    positions = np.arange(width)
+    mirrored = offset[:, None] + (lengths[:, None] - 1 - positions)
+    in_number = positions < lengths[:, None]
+    left = np.take_along_axis(
+        digits, np.clip(offset[:, None] + positions, 0, width - 1), axis=1
+    )
+    right = np.take_along_axis(digits, np.clip(mirrored, 0, width - 1), axis=1)
+    return ((left == right) | ~in_number).all(axis=1)
+
+
+def is_square_many(nums, digits=None):
+    roots = np.sqrt(nums.astype(np.float64)).astype(np.int64)
+    result = np.zeros(len(nums), dtype=bool)
+    for root in (roots - 1, roots, roots + 1):
+        result |= root * root == nums
+    return result & (nums >= 0)
+
+
+def _fibonacci_numbers(limit):
+    fibonacci = [0, 1]
+    while fibonacci[-1] < limit:
+        fibonacci.append(fibonacci[-1] + fibonacci[-2])
+    return np.array(fibonacci, dtype=np.int64)
+
+
+FIBONACCI = _fibonacci_numbers(10**18)
+
+
+def is_fibonacci_many(nums, digits=None):
+    return np.isin(nums, FIBONACCI)
+
+
+def is_palindrome_many(nums, digits):
+    return (digits == digits[:, ::-1]).all(axis=1)
+
+
+def is_one_more_than_palindrome_many(nums, digits=None):
+    return _is_palindrome_number_many(nums - 1)
+
+
+def is_one_less_than_palindrome_many(nums, digits=None):
+    return _is_palindrome_number_many(nums + 1)
+
+
+_prime_power_checker = None
+
+
+def is_prime_raised_to_prime_power_many(nums, digits=None):
+    global _prime_power_checker
+    if _prime_power_checker is None:
+        _prime_power_checker = PrimePowerChecker()
+    return _prime_power_checker.is_prime_power_many(nums)
+
+
+def is_digits_sum_to_7_many(nums, digits):
+    return digits.sum(axis=1) == 7
+
+
+def is_multiple_of_37_many(nums, digits=None):
+    return nums % 37 == 0
+
+
+def is_palindrome_and_multiple_of_23_many(nums, digits):
+    return is_palindrome_many(nums, digits) & (nums % 23 == 0)
+
+
+def is_product_of_digits_end_in_1_many(nums, digits):
+    product = np.ones(len(nums), dtype=np.int64)
+    for column in digits.T:
+        product = (product * column) % 10
+    return product == 1
+
+
+def is_multiple_of_88_many(nums, digits=None):
+    return nums % 88 == 0
+
+
+BATCH_CHECKERS = {
+    "is_square": is_square_many,
+    "is_fibonacci": is_fibonacci_many,
+    "is_one_more_than_palindrome": is_one_more_than_palindrome_many,
+    "is_one_less_than_palindrome": is_one_less_than_palindrome_many,
+    "is_prime_raised_to_prime_power": is_prime_raised_to_prime_power_many,
+    "is_prime_raised_to_prime_power2": is_prime_raised_to_prime_power_many,
+    "is_digits_sum_to_7": is_digits_sum_to_7_many,
+    "is_multiple_of_37": is_multiple_of_37_many,
+    "is_palindrome_and_multiple_of_23": is_palindrome_and_multiple_of_23_many,
+    "is_product_of_digits_end_in_1": is_product_of_digits_end_in_1_many,
+    "is_multiple_of_88": is_multiple_of_88_many,
+}
+
+
+def get_batch_checker(checker):
+    """Batch variant of a scalar row checker.
+
+    Checkers without a vectorized variant fall back to calling the scalar
+    checker on every number.
+    """
+    batch_checker = BATCH_CHECKERS.get(checker.__name__)
+    if batch_checker is not None:
+        return batch_checker
+
+    def fallback(nums, digits=None):
+        return np.fromiter(
+            (checker(int(num)) for num in nums), dtype=bool, count=len(nums)
+        )
+
+    return fallback
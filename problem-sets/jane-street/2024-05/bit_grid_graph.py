@@ -0,0 +1,257 @@
+import networkx as nx
+
+from row_numbers import RowProjection
+
+EMPTY = 255  # stored in place of None in the value bytearray
+
+
+class BitGridGraph:
+    """Compact GridGraph with the same public API.
+
+    Links are stored as two integer bitboards indexed by r * cols + c:
+    bit i of `h_links` joins cell i to its right neighbor and bit i of
+    `v_links` joins cell i to the cell below. Cell values live in a flat
+    bytearray, so a copy is two int references and a bytearray copy.
+    """
+
+    def __init__(self, rows=None, cols=None, filename=None):
+        if filename:
+            self._initialize_from_file(filename)
+        elif rows is not None and cols is not None:
+            self.rows = rows
+            self.cols = cols
+            self.h_links = 0
+            self.v_links = 0
+            self.values = bytearray([EMPTY]) * (rows * cols)
+        else:
+            raise ValueError(
+                "Either rows and cols or filename must be provided."
+            )
+
+    def _initialize_from_file(self, filename):
+        with open(filename, "r") as file:
+            lines = file.readlines()
+
+        self.rows = len(lines) // 2 + 1
+        self.cols = len(lines[0].strip()) // 2 + 1
+        self.h_links = 0
+        self.v_links = 0
+        self.values = bytearray([EMPTY]) * (self.rows * self.cols)
+
+        for r in range(0, self.rows * 2 - 1, 2):
+            for c in range(self.cols - 1):
+                if lines[r][2 * c + 1] == "-":
+                    self.h_links |= 1 << self._index((r // 2, c))
+
+        for r in range(1, self.rows * 2 - 1, 2):
+            for c in range(self.cols):
+                if lines[r][2 * c] == "|":
+                    self.v_links |= 1 << self._index((r // 2, c))
+
+    def _index(self, cell):
+        r, c = cell
+        if not (0 <= r < self.rows and 0 <= c < self.cols):
+            raise ValueError(f"Cell {cell} is out of bounds.")
+        return r * self.cols + c
+
+    def _link(self, cell1, cell2):
+        """Return (name of bitboard, bit index) of the link between cells."""
+        if not self._are_adjacent(cell1, cell2):
+            raise ValueError(f"Cells {cell1} and {cell2} are not adjacent.")
+        first = min(cell1, cell2)
+        if cell1[0] == cell2[0]:
+            return "h_links", self._index(first)
+        return "v_links", self._index(first)
+
+    def add_edge(self, cell1, cell2):
+        board, i = self._link(cell1, cell2)
+        setattr(self, board, getattr(self, board) | (1 << i))
+
+    def remove_edge(self, cell1, cell2):
+        board, i = self._link(cell1, cell2)
+        setattr(self, board, getattr(self, board) & ~(1 << i))
+
+    def neighbors(self, cell):
+        r, c = cell
+        i = self._index(cell)
+        result = []
+        if r > 0 and self.v_links >> (i - self.cols) & 1:
+            result.append((r - 1, c))
+        if c > 0 and self.h_links >> (i - 1) & 1:
+            result.append((r, c - 1))
+        if c < self.cols - 1 and self.h_links >> i & 1:
+            result.append((r, c + 1))
+        if r < self.rows - 1 and self.v_links >> i & 1:
+            result.append((r + 1, c))
+        return result
+
+    @property
+    def adj_list(self):
+        return {
+            (r, c): self.neighbors((r, c))
+            for r in range(self.rows)
+            for c in range(self.cols)
+        }
+
+    def _are_adjacent(self, cell1, cell2):
+        r1, c1 = cell1
+        r2, c2 = cell2
+        return abs(r1 - r2) + abs(c1 - c2) == 1
+
+    def _expand(self, bits):
+        """Grow a set of cells (as a bitboard) along links until closed."""
+        cols = self.cols
+        h = self.h_links
+        v = self.v_links
+        while True:
+            grown = (
+                bits
+                | ((bits & h) << 1)
+                | ((bits >> 1) & h)
+                | ((bits & v) << cols)
+                | ((bits >> cols) & v)
+            )
+            if grown == bits:
+                return bits
+            bits = grown
+
+    def _bits_to_cells(self, bits):
+        cells = []
+        while bits:
+            low = bits & -bits
+            i = low.bit_length() - 1
+            cells.append(divmod(i, self.cols))
+            bits ^= low
+        return cells
+
+    def _region_bitboards(self):
+        remaining = (1 << (self.rows * self.cols)) - 1
+        regions = []
+        while remaining:
+            region = self._expand(remaining & -remaining)
+            regions.append(region)
+            remaining &= ~region
+        return regions
+
+    def find_all_regions(self):
+        return [
+            self._bits_to_cells(region) for region in self._region_bitboards()
+        ]
+
+    def find_region_adjacency(self):
+        regions = self._region_bitboards()
+        labels = [0] * (self.rows * self.cols)
+        region_graph = nx.Graph()
+        for label, region in enumerate(regions):
+            cells = self._bits_to_cells(region)
+            region_graph.add_node(label, cells=cells)
+            for r, c in cells:
+                labels[r * self.cols + c] = label
+
+        cols = self.cols
+        for i, label in enumerate(labels):
+            if i % cols < cols - 1 and labels[i + 1] != label:
+                region_graph.add_edge(label, labels[i + 1])
+            if i + cols < len(labels) and labels[i + cols] != label:
+                region_graph.add_edge(label, labels[i + cols])
+
+        return region_graph
+
+    def get_region_data(self, region):
+        return self.get_cell_data(region[0])
+
+    def region_data_is_okay(self):
+        for region in self._region_bitboards():
+            values = {
+                self.values[r * self.cols + c]
+                for r, c in self._bits_to_cells(region)
+            }
+            if len(values) > 1:
+                return False
+        return True
+
+    def set_region_data(self, region, data):
+        for cell in region:
+            self.set_cell_data(cell, data)
+
+    def get_region_coloring(self, region_graph: nx.Graph):
+        return {
+            node: self.get_region_data(data["cells"])
+            for node, data in region_graph.nodes(data=True)
+        }
+
+    def get_row_projection(self, region_graph: nx.Graph, row=0):
+        return RowProjection(self, region_graph, row)
+
+    def set_cell_data(self, cell, data):
+        i = self._index(cell)
+        if data is None:
+            self.values[i] = EMPTY
+        elif isinstance(data, int) and 0 <= data <= 10:
+            self.values[i] = data
+            # Remove all edges for value 10s
+            if data == 10:
+                mask = 1 << i
+                if cell[1] > 0:
+                    mask |= 1 << (i - 1)
+                self.h_links &= ~mask
+                mask = 1 << i
+                if cell[0] > 0:
+                    mask |= 1 << (i - self.cols)
+                self.v_links &= ~mask
+        else:
+            raise ValueError(
+                f"Data {data} is not a valid value. Must be None or an \
+                integer between 0 and 10."
+            )
+
+    def get_cell_data(self, cell):
+        value = self.values[self._index(cell)]
+        return None if value == EMPTY else value
+
+    def create_subset(self, start_cell, subset_rows, subset_cols):
+        sr, sc = start_cell
+        subset = BitGridGraph(rows=subset_rows, cols=subset_cols)
+        h_row_mask = (1 << (subset_cols - 1)) - 1
+        v_row_mask = (1 << subset_cols) - 1
+
+        for r in range(subset_rows):
+            orig = self._index((sr + r, sc))
+            offset = r * subset_cols
+            subset.values[offset : offset + subset_cols] = self.values[
+                orig : orig + subset_cols
+            ]
+            subset.h_links |= ((self.h_links >> orig) & h_row_mask) << offset
+            if r < subset_rows - 1:
+                subset.v_links |= (
+                    (self.v_links >> orig) & v_row_mask
+                ) << offset
+
+        return subset
+
+    def apply_mask(self, mask):
+        # each row mask is a "0"/"1" string or an int with bit c = column c
+        for r, row_mask in enumerate(mask):
+            if isinstance(row_mask, int):
+                for c in range(self.cols):
+                    if row_mask >> c & 1:
+                        self.set_cell_data((r, c), 10)
+                continue
+            for c, char in enumerate(row_mask):
+                if char == "1":
+                    self.set_cell_data((r, c), 10)
+
+    def custom_copy(self):
+        new_graph = BitGridGraph.__new__(BitGridGraph)
+        new_graph.rows = self.rows
+        new_graph.cols = self.cols
+        new_graph.h_links = self.h_links
+        new_graph.v_links = self.v_links
+        new_graph.values = self.values[:]
+        return new_graph
+
+    def __copy__(self):
+        return self.custom_copy()
+
+    def __deepcopy__(self, memo):
+        return self.custom_copy()
@@ -0,0 +1,97 @@
+import os
+import shutil
+
+import row_store
+
+MANIFEST = "manifest.txt"
+KEY = "key.txt"
+
+
+class Checkpoint:
+    """Per-task result shards of a row file and a manifest of finished
+    tasks, kept in a directory next to it.
+
+    Every result is written to its own shard under a temporary name,
+    fsynced and renamed into place, and only then is the task name
+    appended (and fsynced) to the manifest, so a task listed there always
+    has a complete shard, even after a power loss. After a
+    crash, a run with resume=True skips those tasks. merge() concatenates
+    the shards into the row file and removes the directory.
+
+    key (see result_cache.solver_key) is stored with the shards. A resume
+    whose key differs, e.g. after the board, the clue or the solver
+    changed, discards the old shards instead of mixing them in.
+    """
+
+    def __init__(self, directory, row_length, key, resume=False):
+        self.directory = directory
+        self.row_length = row_length
+        key_name = os.path.join(directory, KEY)
+        if resume and os.path.exists(directory):
+            stored_key = None
+            if os.path.exists(key_name):
+                with open(key_name, "r") as file:
+                    stored_key = file.read()
+            if stored_key != key:
+                print(f"{directory}: checkpoint is for another row, discarded")
+                resume = False
+        if not resume and os.path.exists(directory):
+            shutil.rmtree(directory)
+        os.makedirs(directory, exist_ok=True)
+        if not os.path.exists(key_name):
+            temp_name = f"{key_name}.tmp"
+            with open(temp_name, "w") as file:
+                file.write(key)
+            os.replace(temp_name, key_name)
+        self.manifest_name = os.path.join(directory, MANIFEST)
+        self.completed = self._read_manifest()
+        # rewrite the manifest so new names never follow a partial line
+        temp_name = f"{self.manifest_name}.tmp"
+        with open(temp_name, "w") as file:
+            file.writelines(f"{name}\n" for name in sorted(self.completed))
+        os.replace(temp_name, self.manifest_name)
+        self.manifest = open(self.manifest_name, "a")
+
+    def _read_manifest(self):
+        if not os.path.exists(self.manifest_name):
+            return set()
+        with open(self.manifest_name, "r") as file:
+            names = {line.rstrip("\n") for line in file}
+        # a crash mid-write can leave a partial last line; it has no shard
+        return {name for name in names if os.path.exists(self._shard(name))}
+
+    def _shard(self, name):
+        return os.path.join(self.directory, name.replace("/", "_") + ".bin")
+
+    def add(self, name, row_bytes):
+        # the shard is on disk before the manifest line that vouches for it
+        row_store.write_row_file(
+            self._shard(name), row_bytes, self.row_length, sync=True
+        )
+        self.manifest.write(name + "\n")
+        self.manifest.flush()
+        os.fsync(self.manifest.fileno())
+        self.completed.add(name)
+
+    def merge(self, file_name, names):
+        """Write the shards of names, in that order, after the header of
+        file_name and replace it in one rename."""
+        header = row_store.read_header(file_name)
+        row_bytes = b"".join(
+            row_store.load_rows(self._shard(name)).tobytes() for name in names
+        )
+        row_store.write_row_file(
+            file_name,
+            row_bytes,
+            header.row_length,
+            header.row_index,
+            header.height,
+            header.mask,
+            sync=True,
+        )
+        self.close()
+        shutil.rmtree(self.directory)
+
+    def close(self):
+        if not self.manifest.closed:
+            self.manifest.close()
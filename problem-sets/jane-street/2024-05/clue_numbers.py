@@ -0,0 +1,339 @@
+import itertools
+import math
+import os
+from functools import lru_cache
+
+from prime_to_prime.prime_power_checker import PrimePowerChecker
+from row_numbers import number_digits
+
+
+def palindromes_of_length(k):
+    half_length = (k + 1) // 2
+    for half in range(10 ** (half_length - 1), 10**half_length):
+        s = str(half)
+        yield int(s + s[: k // 2][::-1])
+
+
+def squares_of_length(k):
+    low = math.isqrt(10 ** (k - 1) - 1) + 1
+    high = math.isqrt(10**k - 1)
+    return [i * i for i in range(low, high + 1)]
+
+
+def fibonacci_of_length(k):
+    result = []
+    a, b = 0, 1
+    while a < 10**k:
+        if a >= 10 ** (k - 1) and (not result or result[-1] != a):
+            result.append(a)
+        a, b = b, a + b
+    return result
+
+
+def prime_powers_of_length(k):
+    return PrimePowerChecker().values_between(10 ** (k - 1), 10**k)
+
+
+def one_more_than_palindrome_of_length(k):
+    # 99..9 (k-1 digits) + 1 is the only k digit result from a shorter
+    # palindrome, and 99..9 (k digits) + 1 overflows to k+1 digits.
+    result = [10 ** (k - 1)]
+    result.extend(p + 1 for p in palindromes_of_length(k) if p != 10**k - 1)
+    return result
+
+
+def one_less_than_palindrome_of_length(k):
+    return [p - 1 for p in palindromes_of_length(k)]
+
+
+def palindrome_multiples_of_23_of_length(k):
+    return [p for p in palindromes_of_length(k) if p % 23 == 0]
+
+
+# Clues with a small answer set per length are materialized as lists of
+# numbers, keyed by the name of the row checker they replace.
+CLUE_NUMBER_TABLES = {
+    "is_square": squares_of_length,
+    "is_fibonacci": fibonacci_of_length,
+    "is_prime_raised_to_prime_power": prime_powers_of_length,
+    "is_prime_raised_to_prime_power2": prime_powers_of_length,
+    "is_one_more_than_palindrome": one_more_than_palindrome_of_length,
+    "is_one_less_than_palindrome": one_less_than_palindrome_of_length,
+    "is_palindrome_and_multiple_of_23": palindrome_multiples_of_23_of_length,
+}
+
+
+def _multiple_of(m):
+    return (0, lambda state, digit: (10 * state + digit) % m, lambda s: s == 0)
+
+
+def _digit_sum_step(state, digit):
+    state += digit
+    return state if state <= 7 else None
+
+
+# Clues with huge answer sets (e.g. every 11 digit multiple of 37) are
+# described as digit automata instead: (start state, step, accept). A step
+# returning None is a dead state.
+CLUE_AUTOMATA = {
+    "is_multiple_of_37": _multiple_of(37),
+    "is_multiple_of_88": _multiple_of(88),
+    "is_digits_sum_to_7": (0, _digit_sum_step, lambda s: s == 7),
+    "is_product_of_digits_end_in_1": (
+        1,
+        lambda state, digit: (state * digit) % 10,
+        lambda s: s == 1,
+    ),
+}
+
+
+def digit_sum_7_of_length(k):
+    def helper(prefix, remaining, length):
+        if length == k:
+            if remaining == 0:
+                yield prefix
+            return
+        for digit in range(1 if length == 0 else 0, min(remaining, 9) + 1):
+            yield from helper(
+                10 * prefix + digit, remaining - digit, length + 1
+            )
+
+    return list(helper(0, 7, 0))
+
+
+def product_of_digits_end_in_1_of_length(k):
+    # Any digit 0, 5 or even makes the product end in 0, 5 or an even digit.
+    result = []
+    for digits in itertools.product((1, 3, 7, 9), repeat=k):
+        product = 1
+        num = 0
+        for digit in digits:
+            product = product * digit % 10
+            num = 10 * num + digit
+        if product == 1:
+            result.append(num)
+    return result
+
+
+# Every clue that can be answered by table membership. The automaton clues
+# with a manageable answer set are materialized too; multiples of 37/88
+# have billions of 11 digit answers and stay a modulo check.
+CLUE_MEMBERSHIP_TABLES = {
+    **CLUE_NUMBER_TABLES,
+    "is_digits_sum_to_7": digit_sum_7_of_length,
+    "is_product_of_digits_end_in_1": product_of_digits_end_in_1_of_length,
+}
+
+TABLE_DIR = "clue_tables"
+
+
+def has_clue_candidates(clue):
+    return clue in CLUE_NUMBER_TABLES or clue in CLUE_AUTOMATA
+
+
+def _table_file_name(clue, k):
+    return os.path.join(TABLE_DIR, f"{clue}_{k}.txt")
+
+
+@lru_cache(None)
+def numbers_of_length(clue, k):
+    """Sorted list of the k digit numbers satisfying a table clue.
+
+    Tables are generated once and persisted to clue_tables/, one number
+    per line like prime_powers_list.txt.
+    """
+    file_name = _table_file_name(clue, k)
+    if os.path.exists(file_name):
+        with open(file_name, "r") as file:
+            return [int(line) for line in file]
+
+    numbers = sorted(CLUE_MEMBERSHIP_TABLES[clue](k))
+    os.makedirs(TABLE_DIR, exist_ok=True)
+    temp_name = f"{file_name}.tmp{os.getpid()}"
+    with open(temp_name, "w") as file:
+        file.writelines(f"{num}\n" for num in numbers)
+    os.replace(temp_name, file_name)
+    return numbers
+
+
+def precompute_clue_tables(clues, max_length):
+    """Materialize the tables of every table clue up to max_length digits."""
+    for clue in clues:
+        if clue in CLUE_MEMBERSHIP_TABLES:
+            for k in range(2, max_length + 1):
+                numbers_of_length(clue, k)
+
+
+@lru_cache(None)
+def _membership_set(clue, max_length):
+    return frozenset(
+        num
+        for k in range(2, max_length + 1)
+        for num in numbers_of_length(clue, k)
+    )
+
+
+class ClueTableChecker:
+    """Row checker answering by membership in the precomputed tables.
+
+    Numbers longer than max_length digits (or single digits) are passed to
+    the scalar fallback checker. Pickles as (clue, fallback) so pool
+    workers load the tables themselves instead of receiving them.
+    """
+
+    def __init__(self, clue, fallback, max_length=11):
+        self.__name__ = clue
+        self.fallback = fallback
+        self.max_length = max_length
+        self.low = 10
+        self.high = 10**max_length
+        self._numbers = None
+
+    def __call__(self, num):
+        if self.low <= num < self.high:
+            if self._numbers is None:
+                self._numbers = _membership_set(self.__name__, self.max_length)
+            return num in self._numbers
+        return self.fallback(num)
+
+    def __reduce__(self):
+        return (
+            ClueTableChecker,
+            (self.__name__, self.fallback, self.max_length),
+        )
+
+
+def get_table_checker(checker, max_length=11):
+    """Table backed replacement for checker, or checker if it has no table."""
+    if checker.__name__ in CLUE_MEMBERSHIP_TABLES:
+        return ClueTableChecker(checker.__name__, checker, max_length)
+    return checker
+
+
+def get_runs(num):
+    """Split a number into maximal runs of equal digits.
+
+    Returns (run_lengths, run_digits), e.g. 1155 -> ((2, 2), (1, 5)).
+    """
+    lengths = []
+    digits = []
+    for digit in number_digits(num):
+        if digits and digits[-1] == digit:
+            lengths[-1] += 1
+        else:
+            lengths.append(1)
+            digits.append(digit)
+    return tuple(lengths), tuple(digits)
+
+
+@lru_cache(None)
+def _run_index(clue, k):
+    index = {}
+    for num in numbers_of_length(clue, k):
+        run_lengths, run_digits = get_runs(num)
+        index.setdefault(run_lengths, []).append(run_digits)
+    return index
+
+
+def _run_step(step, state, digit, length):
+    for _ in range(length):
+        state = step(state, digit)
+        if state is None:
+            return None
+    return state
+
+
+@lru_cache(None)
+def _run_prefixes(clue, runs):
+    prefixes = set()
+    for run_digits in _run_index(clue, sum(runs)).get(runs, []):
+        for i in range(len(run_digits) + 1):
+            prefixes.add(run_digits[:i])
+    return prefixes
+
+
+@lru_cache(None)
+def _automaton_finisher(clue, runs):
+    """can_finish(i, state, prev_digit) for the remaining runs[i:]."""
+    _, step, accept = CLUE_AUTOMATA[clue]
+
+    @lru_cache(None)
+    def can_finish(i, state, prev_digit):
+        if i == len(runs):
+            return accept(state)
+        for digit in range(1 if i == 0 else 0, 10):
+            if digit == prev_digit:
+                continue
+            next_state = _run_step(step, state, digit, runs[i])
+            if next_state is not None and can_finish(i + 1, next_state, digit):
+                return True
+        return False
+
+    return can_finish
+
+
+def _automaton_candidates(clue, runs):
+    start, step, _ = CLUE_AUTOMATA[clue]
+    can_finish = _automaton_finisher(clue, runs)
+
+    def helper(i, state, digits):
+        if i == len(runs):
+            yield tuple(digits)
+            return
+        prev_digit = digits[-1] if digits else None
+        for digit in range(1 if i == 0 else 0, 10):
+            if digit == prev_digit:
+                continue
+            next_state = _run_step(step, state, digit, runs[i])
+            if next_state is not None and can_finish(i + 1, next_state, digit):
+                digits.append(digit)
+                yield from helper(i + 1, next_state, digits)
+                digits.pop()
+
+    if can_finish(0, start, None):
+        yield from helper(0, start, [])
+
+
+def segment_prefix_is_feasible(clue, runs, digits):
+    """Whether the digits of the leading runs can still form a valid number.
+
+    Numbers shorter than two digits or with a leading 0 never are. For
+    table clues the prefix is looked up among the valid numbers with the
+    same runs; for automaton clues the state after the prefix (residue,
+    digit sum, digit product) must be able to reach an accepting state.
+    Clues without either are only checked once complete, by the caller.
+    """
+    runs = tuple(runs)
+    if sum(runs) < 2 or (digits and digits[0] == 0):
+        return False
+    if clue in CLUE_NUMBER_TABLES:
+        return tuple(digits) in _run_prefixes(clue, runs)
+    if clue in CLUE_AUTOMATA:
+        state, step, _ = CLUE_AUTOMATA[clue]
+        prev_digit = None
+        for run_length, digit in zip(runs, digits):
+            if digit == prev_digit:
+                return False
+            state = _run_step(step, state, digit, run_length)
+            if state is None:
+                return False
+            prev_digit = digit
+        return _automaton_finisher(clue, runs)(len(digits), state, prev_digit)
+    return True
+
+
+def segment_candidates(clue, runs):
+    """Yield one digit per run for every valid number of a segment.
+
+    `runs` holds the lengths of the consecutive regions of an unshaded
+    segment. Neighboring regions must differ, so a number fits the segment
+    only if its maximal runs of equal digits are exactly `runs`. Numbers
+    must be at least two digits long and may not begin with a 0.
+    """
+    k = sum(runs)
+    if k < 2:
+        return
+    if clue in CLUE_NUMBER_TABLES:
+        yield from _run_index(clue, k).get(tuple(runs), [])
+    else:
+        yield from _automaton_candidates(clue, tuple(runs))
@@ -0,0 +1,123 @@
+import networkx as nx
+
+
+def get_all_colorings(
+    graph: nx.Graph,
+    m,
+    initial_colors=None,
+    partial_predicate=None,
+    node_order=None,
+):
+    """Yield every proper m-coloring of graph as a {node: color} dict.
+
+    Each node keeps its remaining colors as a bitset domain. Assigning a
+    color removes it from the uncolored neighbors (forward checking), and a
+    branch stops as soon as a neighbor runs out of colors. The next node is
+    the most constrained one (smallest domain, then most uncolored
+    neighbors). node_order fixes the order of the nodes it lists; any
+    uncolored nodes it leaves out follow, most constrained first.
+
+    partial_predicate(color, node) is called after every assignment with the
+    current {node: color or None} dict and the node that was just colored;
+    returning False prunes the branch.
+    Colors in initial_colors are kept as they are; colors outside range(m)
+    (e.g. 10 for shaded cells) do not restrict their neighbors.
+    """
+    nodes = list(graph.nodes())
+    index = {node: i for i, node in enumerate(nodes)}
+    neighbors = [[index[n] for n in graph.neighbors(node)] for node in nodes]
+    domains = [(1 << m) - 1] * len(nodes)
+    color = {node: None for node in nodes}
+    if initial_colors:
+        color.update(initial_colors)
+
+    uncolored = set()
+    for i, node in enumerate(nodes):
+        c = color[node]
+        if c is None:
+            uncolored.add(i)
+        elif 0 <= c < m:
+            for j in neighbors[i]:
+                domains[j] &= ~(1 << c)
+    if any(domains[i] == 0 for i in uncolored):
+        return
+
+    if node_order is not None:
+        order = [index[n] for n in node_order if index[n] in uncolored]
+    else:
+        order = None
+
+    def select(depth):
+        if order is not None and depth < len(order):
+            return order[depth]
+        return min(
+            uncolored,
+            key=lambda i: (
+                domains[i].bit_count(),
+                -sum(1 for j in neighbors[i] if j in uncolored),
+            ),
+        )
+
+    def helper(depth):
+        if not uncolored:
+            yield color.copy()
+            return
+
+        i = select(depth)
+        node = nodes[i]
+        uncolored.remove(i)
+        bits = domains[i]
+        while bits:
+            low = bits & -bits
+            bits ^= low
+            c = low.bit_length() - 1
+
+            pruned = []
+            is_valid = True
+            for j in neighbors[i]:
+                if j in uncolored and domains[j] & low:
+                    domains[j] ^= low
+                    pruned.append(j)
+                    if domains[j] == 0:
+                        is_valid = False
+                        break
+
+            if is_valid:
+                color[node] = c
+                if partial_predicate is None or partial_predicate(color, node):
+                    yield from helper(depth + 1)
+                color[node] = None
+
+            for j in pruned:
+                domains[j] |= low
+        uncolored.add(i)
+
+    yield from helper(0)
+
+
+def count_colorings(graph: nx.Graph, m, initial_colors=None):
+    """Number of proper m-colorings of graph that extend initial_colors.
+
+    Uncolored nodes only interact within their connected component of the
+    uncolored subgraph, so each component is counted on its own (with its
+    colored neighbors fixed) and the counts are multiplied.
+    """
+    color = {node: None for node in graph}
+    if initial_colors:
+        color.update(initial_colors)
+    uncolored = [node for node in graph if color[node] is None]
+    total = 1
+    for component in nx.connected_components(graph.subgraph(uncolored)):
+        fixed = {
+            neighbor: color[neighbor]
+            for node in component
+            for neighbor in graph.neighbors(node)
+            if neighbor not in component
+        }
+        subgraph = graph.subgraph(component | fixed.keys())
+        total *= sum(
+            1 for _ in get_all_colorings(subgraph, m, initial_colors=fixed)
+        )
+        if total == 0:
+            return 0
+    return total
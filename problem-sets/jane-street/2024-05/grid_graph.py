@@ -1,9 +1,17 @@
 import matplotlib.pyplot as plt
 import networkx as nx
 
+from row_numbers import RowProjection
+
 
 class GridGraph:
     def __init__(self, rows=None, cols=None, filename=None):
+        # Region partition, built lazily on the first region query and then
+        # kept up to date by add_edge/remove_edge.
+        self._region_of = None  # cell -> region id
+        self._region_cells = None  # region id -> set of cells
+        self._region_neighbors = None  # region id -> set of region ids
+        self._next_region_id = 0
         if filename:
             self._initialize_from_file(filename)
         elif rows is not None and cols is not None:
@@ -50,10 +58,14 @@ class GridGraph:
 
         self.adj_list[cell1].append(cell2)
         self.adj_list[cell2].append(cell1)
+        if self._region_of is not None:
+            self._merge_regions(self._region_of[cell1], self._region_of[cell2])
 
     def remove_edge(self, cell1, cell2):
         self.adj_list[cell1].remove(cell2)
         self.adj_list[cell2].remove(cell1)
+        if self._region_of is not None:
+            self._split_region(cell1, cell2)
 
     def neighbors(self, cell):
         return self.adj_list[cell]
@@ -63,7 +75,111 @@ class GridGraph:
         r2, c2 = cell2
         return abs(r1 - r2) + abs(c1 - c2) == 1
 
+    def _rebuild_regions(self):
+        # Label every cell with its region once, then derive the region
+        # adjacency from a single sweep over orthogonal neighbor pairs.
+        self._region_of = {}
+        self._region_cells = {}
+        for region_id, region in enumerate(self._find_all_regions_dfs()):
+            self._region_cells[region_id] = set(region)
+            for cell in region:
+                self._region_of[cell] = region_id
+
+        region_of = self._region_of
+        self._region_neighbors = {i: set() for i in self._region_cells}
+        for (r, c), region_id in region_of.items():
+            for other_cell in ((r + 1, c), (r, c + 1)):
+                other = region_of.get(other_cell)
+                if other is not None and other != region_id:
+                    self._region_neighbors[region_id].add(other)
+                    self._region_neighbors[other].add(region_id)
+        self._next_region_id = len(self._region_cells)
+
+    def _ensure_regions(self):
+        if self._region_of is None:
+            self._rebuild_regions()
+
+    def _orthogonal_cells(self, cell):
+        r, c = cell
+        for neighbor in ((r - 1, c), (r + 1, c), (r, c - 1), (r, c + 1)):
+            if neighbor in self.data:
+                yield neighbor
+
+    def _scan_region_neighbors(self, region_id):
+        region_of = self._region_of
+        neighbors = set()
+        for cell in self._region_cells[region_id]:
+            for other in self._orthogonal_cells(cell):
+                if region_of[other] != region_id:
+                    neighbors.add(region_of[other])
+        return neighbors
+
+    def _merge_regions(self, region1, region2):
+        if region1 == region2:
+            return
+        cells1 = self._region_cells[region1]
+        cells2 = self._region_cells[region2]
+        if len(cells1) < len(cells2):
+            region1, region2 = region2, region1
+        # region2 (the smaller one) is absorbed into region1
+        for cell in self._region_cells[region2]:
+            self._region_of[cell] = region1
+        self._region_cells[region1] |= self._region_cells.pop(region2)
+        neighbors2 = self._region_neighbors.pop(region2)
+        for other in neighbors2:
+            self._region_neighbors[other].discard(region2)
+            if other != region1:
+                self._region_neighbors[other].add(region1)
+        neighbors1 = self._region_neighbors[region1]
+        neighbors1 |= neighbors2
+        neighbors1.discard(region1)
+
+    def _split_region(self, cell1, cell2):
+        """Update the partition after the link cell1-cell2 was removed."""
+        region_id = self._region_of[cell1]
+        # Only cells of the old region can be reached, so the search stays
+        # local to the region that was touched.
+        visited = {cell2}
+        stack = [cell2]
+        while stack:
+            current = stack.pop()
+            if current == cell1:
+                return  # still connected, nothing changes
+            for neighbor in self.adj_list[current]:
+                if neighbor not in visited:
+                    visited.add(neighbor)
+                    stack.append(neighbor)
+
+        new_id = self._next_region_id
+        self._next_region_id += 1
+        self._region_cells[region_id] -= visited
+        self._region_cells[new_id] = visited
+        for cell in visited:
+            self._region_of[cell] = new_id
+        self._region_neighbors[new_id] = set()
+
+        for other in self._region_neighbors[region_id]:
+            self._region_neighbors[other].discard(region_id)
+        for changed in (region_id, new_id):
+            self._region_neighbors[changed] = self._scan_region_neighbors(
+                changed
+            )
+            for other in self._region_neighbors[changed]:
+                self._region_neighbors[other].add(changed)
+
+    def _sorted_region_ids(self):
+        self._ensure_regions()
+        return sorted(
+            self._region_cells, key=lambda i: min(self._region_cells[i])
+        )
+
     def find_all_regions(self):
+        return [
+            sorted(self._region_cells[region_id])
+            for region_id in self._sorted_region_ids()
+        ]
+
+    def _find_all_regions_dfs(self):
         visited = set()
         regions = []
 
@@ -92,16 +208,11 @@ class GridGraph:
         return self.get_cell_data(region[0])
 
     def region_data_is_okay(self):
-        region_graph = self.find_region_adjacency
-        for _, data in region_graph.nodes(data=True):
-            region_value = -1
-            for cell in data["cells"]:
-                cell_data = self.get_cell_data(cell)
-                if region_value == -1:
-                    region_value = cell_data
-                else:
-                    if region_value != cell_data:
-                        return False
+        self._ensure_regions()
+        for cells in self._region_cells.values():
+            values = {self.data[cell] for cell in cells}
+            if len(values) > 1:
+                return False
         return True
 
     def set_region_data(self, region, data):
@@ -114,6 +225,9 @@ class GridGraph:
             for node, data in region_graph.nodes(data=True)
         }
 
+    def get_row_projection(self, region_graph: nx.Graph, row=0):
+        return RowProjection(self, region_graph, row)
+
     def are_regions_adjacent(self, region1, region2):
         for cell1 in region1:
             for cell2 in region2:
@@ -122,14 +236,17 @@ class GridGraph:
         return False
 
     def find_region_adjacency(self):
-        regions = self.find_all_regions()
+        region_ids = self._sorted_region_ids()
+        node_of = {region_id: i for i, region_id in enumerate(region_ids)}
         region_graph = nx.Graph()
 
-        for i, region in enumerate(regions):
-            region_graph.add_node(i, cells=region)
-            for j in range(i):
-                if self.are_regions_adjacent(regions[i], regions[j]):
-                    region_graph.add_edge(i, j)
+        for i, region_id in enumerate(region_ids):
+            region_graph.add_node(
+                i, cells=sorted(self._region_cells[region_id])
+            )
+        for region_id in region_ids:
+            for other in self._region_neighbors[region_id]:
+                region_graph.add_edge(node_of[region_id], node_of[other])
 
         return region_graph
 
@@ -249,7 +366,13 @@ class GridGraph:
         return subset
 
     def apply_mask(self, mask):
+        # each row mask is a "0"/"1" string or an int with bit c = column c
         for r, row_mask in enumerate(mask):
+            if isinstance(row_mask, int):
+                for c in range(self.cols):
+                    if row_mask >> c & 1:
+                        self.set_cell_data((r, c), 10)
+                continue
             for c, char in enumerate(row_mask):
                 if char == "1":
                     self.set_cell_data((r, c), 10)
@@ -260,4 +383,14 @@ class GridGraph:
             cell: neighbors[:] for cell, neighbors in self.adj_list.items()
         }
         new_graph.data = {cell: value for cell, value in self.data.items()}
+        if self._region_of is not None:
+            new_graph._region_of = self._region_of.copy()
+            new_graph._region_cells = {
+                i: cells.copy() for i, cells in self._region_cells.items()
+            }
+            new_graph._region_neighbors = {
+                i: neighbors.copy()
+                for i, neighbors in self._region_neighbors.items()
+            }
+            new_graph._next_region_id = self._next_region_id
         return new_graph
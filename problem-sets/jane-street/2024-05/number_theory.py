@@ -0,0 +1,151 @@
+import math
+from functools import lru_cache
+
+DEFAULT_CACHE_SIZE = 1 << 16
+
+
+class BoundedCache:
+    """LRU cache with eviction whose size can be changed at runtime."""
+
+    instances = []
+
+    def __init__(self, function, maxsize=DEFAULT_CACHE_SIZE):
+        self.function = function
+        self.__name__ = function.__name__
+        self.__doc__ = function.__doc__
+        self.set_maxsize(maxsize)
+        BoundedCache.instances.append(self)
+
+    def set_maxsize(self, maxsize):
+        self._cached = lru_cache(maxsize=maxsize)(self.function)
+
+    def cache_info(self):
+        return self._cached.cache_info()
+
+    def __call__(self, n):
+        return self._cached(n)
+
+
+def bounded_cache(function):
+    return BoundedCache(function)
+
+
+def set_cache_size(maxsize):
+    """Resize (and clear) every number theory cache."""
+    for cache in BoundedCache.instances:
+        cache.set_maxsize(maxsize)
+
+
+def _residue_table(m):
+    table = bytearray(m)
+    for i in range(m):
+        table[i * i % m] = 1
+    return bytes(table)
+
+
+# A square is a quadratic residue modulo every m. Together these moduli
+# reject all but about 1 in 100 non-squares without taking a root.
+_SQUARES_MOD_64 = _residue_table(64)
+_SQUARES_MOD_63 = _residue_table(63)
+_SQUARES_MOD_65 = _residue_table(65)
+_SQUARES_MOD_11 = _residue_table(11)
+
+
+def _is_square(n):
+    if n < 0:
+        return False
+    if not _SQUARES_MOD_64[n & 63]:
+        return False
+    r = n % 45045  # 63 * 65 * 11
+    if (
+        not _SQUARES_MOD_63[r % 63]
+        or not _SQUARES_MOD_65[r % 65]
+        or not _SQUARES_MOD_11[r % 11]
+    ):
+        return False
+    root = math.isqrt(n)
+    return root * root == n
+
+
+@bounded_cache
+def is_square(n):
+    """Exact perfect square test for integers of any size."""
+    return _is_square(n)
+
+
+@bounded_cache
+def is_fibonacci(n):
+    """n is a Fibonacci number iff 5n^2 + 4 or 5n^2 - 4 is a square."""
+    if n < 0:
+        return False
+    return _is_square(5 * n * n + 4) or _is_square(5 * n * n - 4)
+
+
+def integer_root(n, k):
+    """Largest r with r**k <= n, exact for integers of any size."""
+    if n < 2:
+        return n
+    if k == 2:
+        return math.isqrt(n)
+    # Newton's method from above; 2**ceil(bits / k) is never below the root
+    x = 1 << -(-n.bit_length() // k)
+    while True:
+        y = ((k - 1) * x + n // x ** (k - 1)) // k
+        if y >= x:
+            return x
+        x = y
+
+
+_SMALL_PRIMES = (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37)
+
+# Testing these bases is deterministic for n < 3.18 * 10**23, which covers
+# every 64-bit input. Beyond that a pass means a strong probable prime.
+_MILLER_RABIN_BASES = _SMALL_PRIMES
+
+
+def _is_prime(n):
+    if n < 2:
+        return False
+    for p in _SMALL_PRIMES:
+        if n % p == 0:
+            return n == p
+    d = n - 1
+    s = 0
+    while d % 2 == 0:
+        d //= 2
+        s += 1
+    for a in _MILLER_RABIN_BASES:
+        x = pow(a, d, n)
+        if x == 1 or x == n - 1:
+            continue
+        for _ in range(s - 1):
+            x = x * x % n
+            if x == n - 1:
+                break
+        else:
+            return False
+    return True
+
+
+@bounded_cache
+def is_prime(n):
+    """Deterministic Miller-Rabin primality test for 64-bit integers."""
+    return _is_prime(n)
+
+
+@bounded_cache
+def is_prime_power(n):
+    """Whether n = p**q for primes p and q.
+
+    Only prime exponents q <= log2(n) can work, and for each the base is
+    the exact integer q-th root of n.
+    """
+    if n < 4:
+        return False
+    for q in range(2, n.bit_length() + 1):
+        if not _is_prime(q):
+            continue
+        root = integer_root(n, q)
+        if root**q == n:
+            return _is_prime(root)
+    return False
@@ -1,24 +1,62 @@
-import bisect
 import os
 
+import numpy as np
+
+# On-disk format of the binary table: sorted little-endian uint64 values
+# with no header, so it can be memory-mapped directly.
+BINARY_DTYPE = np.dtype("<u8")
+
+
+def binary_file_name(filename):
+    return os.path.splitext(filename)[0] + ".u64"
+
+
+def write_binary_prime_powers(values, filename):
+    """Write sorted values to filename atomically in the binary format."""
+    temp_name = f"{filename}.tmp{os.getpid()}"
+    np.asarray(values, dtype=BINARY_DTYPE).tofile(temp_name)
+    os.replace(temp_name, filename)
+
 
 class PrimePowerChecker:
     def __init__(self, filename="prime_to_prime/prime_powers_list.txt"):
         self.prime_powers = self._load_prime_powers(filename)
 
     def _load_prime_powers(self, filename):
-        if not os.path.exists(filename):
-            raise FileNotFoundError(f"The file {filename} does not exist.")
-        with open(filename, "r") as file:
-            prime_powers = [int(line.strip()) for line in file]
-        return prime_powers
+        # The text list is converted once to a sorted uint64 file which is
+        # then memory-mapped read-only, so every Pool worker shares the same
+        # pages instead of parsing its own list of ints.
+        binary_name = binary_file_name(filename)
+        if not os.path.exists(binary_name):
+            if not os.path.exists(filename):
+                raise FileNotFoundError(f"The file {filename} does not exist.")
+            with open(filename, "r") as file:
+                prime_powers = sorted(int(line.strip()) for line in file)
+            write_binary_prime_powers(prime_powers, binary_name)
+        return np.memmap(binary_name, dtype=BINARY_DTYPE, mode="r")
 
     def is_prime_power(self, num):
-        index = bisect.bisect_left(self.prime_powers, num)
+        if num < 0 or num > 0xFFFFFFFFFFFFFFFF:
+            return False
+        index = int(np.searchsorted(self.prime_powers, np.uint64(num)))
         return (
-            index < len(self.prime_powers) and self.prime_powers[index] == num
+            index < len(self.prime_powers)
+            and int(self.prime_powers[index]) == num
         )
 
+    def is_prime_power_many(self, nums):
+        """Boolean mask of which nums are prime powers (vectorized)."""
+        nums = np.asarray(nums).astype(BINARY_DTYPE)
+        indexes = np.searchsorted(self.prime_powers, nums)
+        indexes = np.minimum(indexes, len(self.prime_powers) - 1)
+        return np.asarray(self.prime_powers[indexes] == nums)
+
+    def values_between(self, low, high):
+        """Prime powers in [low, high) as a list of Python ints."""
+        start = np.searchsorted(self.prime_powers, np.uint64(low))
+        end = np.searchsorted(self.prime_powers, np.uint64(high))
+        return self.prime_powers[start:end].tolist()
+
 
 # # Usage
 # checker = PrimePowerChecker()
@@ -1,28 +1,112 @@
-import sympy
+import argparse
+import heapq
+import itertools
+import math
+import os
+import sys
+import time
+from array import array
 
+from number_theory import integer_root
+from prime_to_prime.prime_power_checker import binary_file_name
 
-def generate_prime_powers(max_value, filename):
-    # Generate a list of prime numbers up to a reasonable limit for both p and
-    # q
-    primes = list(
-        sympy.primerange(2, 10**6)
-    )  # Adjust the upper limit as needed
-    power_set = set()
+DEFAULT_TEXT_FILE = "prime_to_prime/prime_powers_list.txt"
 
-    for p in primes:
-        for q in primes:
-            if q > 1:
-                value = p**q
-                if value >= max_value:
-                    break
-                power_set.add(value)
 
-    power_list = sorted(power_set)
+def small_primes(limit):
+    """Primes <= limit with a plain sieve of Eratosthenes."""
+    if limit < 2:
+        return []
+    sieve = bytearray([1]) * (limit + 1)
+    sieve[0:2] = b"\x00\x00"
+    for p in range(2, math.isqrt(limit) + 1):
+        if sieve[p]:
+            sieve[p * p :: p] = bytes(len(range(p * p, limit + 1, p)))
+    return list(itertools.compress(range(limit + 1), sieve))
 
-    with open(filename, "w") as file:
-        for number in power_list:
-            file.write(f"{number}\n")
 
+def primes_below(limit, segment_size=1 << 16):
+    """Yield the primes < limit in order with a segmented sieve."""
+    base_primes = small_primes(math.isqrt(max(limit - 1, 0)))
+    for low in range(2, limit, segment_size):
+        high = min(low + segment_size, limit)
+        segment = bytearray([1]) * (high - low)
+        for p in base_primes:
+            if p * p >= high:
+                break
+            start = max(p * p, (low + p - 1) // p * p)
+            segment[start - low :: p] = bytes(len(range(start, high, p)))
+        yield from itertools.compress(range(low, high), segment)
 
-# Usage
-generate_prime_powers(100000000000, "prime_powers_list.txt")
+
+def prime_powers(max_digits):
+    """Yield every p**q < 10**max_digits (p, q prime) in increasing order.
+
+    For each exponent q the powers p**q of increasing primes are already
+    sorted, so the streams are merged instead of collected and sorted.
+    Distinct (p, q) never give the same value.
+    """
+    limit = 10**max_digits
+    streams = [
+        _powers_below(q, limit) for q in small_primes(limit.bit_length())
+    ]
+    return heapq.merge(*streams)
+
+
+def _powers_below(q, limit):
+    for p in primes_below(integer_root(limit - 1, q) + 1):
+        yield p**q
+
+
+def generate_prime_powers(
+    max_digits, filename, text_filename=None, chunk_size=1 << 14
+):
+    """Stream the prime power table into the checker's binary format."""
+    temp_name = f"{filename}.tmp{os.getpid()}"
+    text_file = open(text_filename, "w") if text_filename else None
+    count = 0
+    with open(temp_name, "wb") as file:
+        chunk = array("Q")
+        for value in prime_powers(max_digits):
+            chunk.append(value)
+            if text_file:
+                text_file.write(f"{value}\n")
+            if len(chunk) == chunk_size:
+                count += _write_chunk(file, chunk)
+                chunk = array("Q")
+        count += _write_chunk(file, chunk)
+    if text_file:
+        text_file.close()
+    os.replace(temp_name, filename)
+    return count
+
+
+def _write_chunk(file, chunk):
+    if sys.byteorder == "big":
+        chunk.byteswap()  # the table is little-endian
+    chunk.tofile(file)
+    return len(chunk)
+
+
+if __name__ == "__main__":
+    # Usage (from 2024-05/): python -m prime_to_prime.prime_to_prime -d 11
+    parser = argparse.ArgumentParser(
+        description="Generate the table of primes raised to prime powers."
+    )
+    parser.add_argument(
+        "-d", "--digits", type=int, default=11, help="max number of digits"
+    )
+    parser.add_argument(
+        "-o", "--output", default=binary_file_name(DEFAULT_TEXT_FILE)
+    )
+    parser.add_argument(
+        "--text", default=None, help="also write a text list to this file"
+    )
+    args = parser.parse_args()
+
+    start_time = time.time()
+    count = generate_prime_powers(args.digits, args.output, args.text)
+    print(
+        f"Wrote {count} prime powers below 10^{args.digits} to "
+        f"{args.output} in {time.time() - start_time:.3f} s"
+    )
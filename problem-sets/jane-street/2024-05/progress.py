@@ -0,0 +1,65 @@
+import json
+import time
+
+
+class ProgressReporter:
+    """Aggregates per-mask results in the parent process.
+
+    Workers only return their stats dicts with the results, so reporting
+    costs nothing on the worker side. A summary line is printed at most
+    every min_interval seconds (and once at the end), and every mask can
+    optionally be logged as one JSON line to stats_file (rewritten on
+    every run, like the row file).
+    """
+
+    def __init__(self, total, label="", min_interval=1.0, stats_file=None):
+        self.total = total
+        self.label = label
+        self.min_interval = min_interval
+        self.completed = 0
+        self.totals = {}
+        self.start_time = time.time()
+        self.last_render = 0
+        self.rendered_count = -1
+        self.stats_file = open(stats_file, "w") if stats_file else None
+
+    def update(self, mask, stats):
+        self.completed += 1
+        for key, value in stats.items():
+            if isinstance(value, (int, float)):
+                self.totals[key] = self.totals.get(key, 0) + value
+        if self.stats_file:
+            record = {"label": self.label, "mask": mask, **stats}
+            self.stats_file.write(json.dumps(record) + "\n")
+        now = time.time()
+        if now - self.last_render >= self.min_interval:
+            self.last_render = now
+            self.render()
+
+    def render(self):
+        self.rendered_count = self.completed
+        elapsed = time.time() - self.start_time
+        rate = self.completed / elapsed if elapsed > 0 else 0
+        remaining = self.total - self.completed
+        eta = remaining / rate if rate > 0 else float("inf")
+        totals = "\t".join(
+            f"{key}: {round(value, 3)}" for key, value in self.totals.items()
+        )
+        print(
+            f"{self.label} [{self.completed}/{self.total}]\t{totals}\t"
+            f"elapsed: {elapsed:.1f} s\tmasks/s: {rate:.1f}\t"
+            f"eta: {eta:.1f} s"
+        )
+
+    def close(self):
+        if self.rendered_count != self.completed:
+            self.render()
+        if self.stats_file:
+            self.stats_file.close()
+            self.stats_file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,64 @@
+import hashlib
+import os
+
+import row_store
+
+CACHE_DIR = "row_cache"
+# Part of every key. Bump it whenever a change to the checkers, pruning or
+# row rules can change which rows a task yields, so old entries are missed.
+CACHE_VERSION = 1
+
+
+def graph_fingerprint(graph):
+    """Hash of a graph's size, links and cell values.
+
+    Only the public graph API is used, so a GridGraph and a BitGridGraph
+    of the same board hash the same.
+    """
+    digest = hashlib.sha256(f"{graph.rows}x{graph.cols}".encode())
+    for r in range(graph.rows):
+        for c in range(graph.cols):
+            cell = (r, c)
+            links = sorted({n for n in graph.neighbors(cell) if n > cell})
+            data = graph.get_cell_data(cell)
+            digest.update(repr((cell, links, data)).encode())
+    return digest.hexdigest()
+
+
+def solver_key(graph, clue, row_length):
+    """What a task's rows depend on besides the task itself: the solver
+    version, the row subgraph, the clue id and the row length."""
+    return f"v{CACHE_VERSION}/{graph_fingerprint(graph)}/{clue}/{row_length}"
+
+
+class ResultCache:
+    """On-disk cache of the valid rows of every solved task.
+
+    Entries are content addressed: the file name is a hash of
+    CACHE_VERSION, the row subgraph (links and cell values), the clue id
+    and the task name (mask and first color), so reruns, other row ranges
+    and boards sharing a row structure and clue reuse them. Each entry is
+    a row file that is written under a temporary name and renamed into
+    place, so an entry is either complete or missing.
+    """
+
+    def __init__(self, graph, clue, row_length, cache_dir=CACHE_DIR):
+        self.prefix = solver_key(graph, clue, row_length) + "/"
+        self.row_length = row_length
+        self.cache_dir = cache_dir
+
+    def _file_name(self, name):
+        key = hashlib.sha256((self.prefix + name).encode()).hexdigest()
+        return os.path.join(self.cache_dir, key[:2], f"{key}.bin")
+
+    def get(self, name):
+        """Packed rows of a task, or None if it has not been solved."""
+        file_name = self._file_name(name)
+        if not os.path.exists(file_name):
+            return None
+        return row_store.load_rows(file_name).tobytes()
+
+    def put(self, name, row_bytes):
+        file_name = self._file_name(name)
+        os.makedirs(os.path.dirname(file_name), exist_ok=True)
+        row_store.write_row_file(file_name, row_bytes, self.row_length)
@@ -0,0 +1,86 @@
+from functools import lru_cache
+from operator import itemgetter
+
+# A row is a list of cell values (0-9 digits, 10 shaded). Its numbers are
+# the maximal unshaded runs, read left to right.
+
+
+@lru_cache(None)
+def segment_layout(mask, row_length):
+    """Segments of a row with shading mask (bit c set = column c shaded).
+
+    Returns a tuple of (start, end, place_values) per unshaded segment,
+    where place_values[i] = 10 ** (end - start - 1 - i).
+    """
+    layout = []
+    start = None
+    for c in range(row_length + 1):
+        is_shaded = c == row_length or mask >> c & 1
+        if is_shaded and start is not None:
+            length = c - start
+            place_values = tuple(10**i for i in range(length - 1, -1, -1))
+            layout.append((start, c, place_values))
+            start = None
+        elif not is_shaded and start is None:
+            start = c
+    return tuple(layout)
+
+
+def segment_digits(row, layout):
+    return [tuple(row[start:end]) for start, end, _ in layout]
+
+
+def segments_of(row, layout):
+    """(number, digits) for every segment of a row."""
+    return [
+        (sum(p * d for p, d in zip(place_values, digits)), digits)
+        for digits, (_, _, place_values) in zip(
+            segment_digits(row, layout), layout
+        )
+    ]
+
+
+def number_digits(num):
+    """Decimal digits of a non-negative int, most significant first."""
+    if num < 0:
+        raise ValueError(f"{num} is negative.")
+    digits = []
+    while True:
+        num, digit = divmod(num, 10)
+        digits.append(digit)
+        if num == 0:
+            return tuple(reversed(digits))
+
+
+class RowProjection:
+    """Reads one row of a colored region graph without touching the graph.
+
+    The region of every cell in the row and the segment layout of its
+    shading are looked up once (per mask), so a coloring (node -> value,
+    shaded regions included as 10) becomes a row with a single gather
+    instead of a graph copy and a set_region_data per region.
+    """
+
+    def __init__(self, graph, region_graph, row=0):
+        region_of = {
+            cell: node
+            for node, data in region_graph.nodes(data=True)
+            for cell in data["cells"]
+        }
+        self.nodes = [region_of[(row, c)] for c in range(graph.cols)]
+        self.mask = sum(
+            1 << c
+            for c in range(graph.cols)
+            if graph.get_cell_data((row, c)) == 10
+        )
+        self.layout = segment_layout(self.mask, graph.cols)
+        self._gather = itemgetter(*self.nodes)
+        if len(self.nodes) == 1:
+            self._gather = lambda coloring: (coloring[self.nodes[0]],)
+
+    def row(self, coloring):
+        return list(self._gather(coloring))
+
+    def segments(self, coloring):
+        """(number, digits) for every unshaded segment of the row."""
+        return segments_of(self._gather(coloring), self.layout)
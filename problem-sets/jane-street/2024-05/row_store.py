@@ -0,0 +1,99 @@
+import os
+import struct
+from collections import namedtuple
+
+import numpy as np
+
+# Binary row file: a 16 byte header followed by fixed size records. A record
+# is `height` rows of `row_length` cells, one byte per cell (0-9 digits,
+# 10 shaded), so a single 11 cell row takes 11 bytes instead of ~40 chars.
+MAGIC = b"NCR1"
+HEADER = struct.Struct("<4sHHHHI")  # magic, row, height, length, 0, mask
+MIXED_MASKS = 0xFFFFFFFF  # header mask when records come from many masks
+
+RowFileHeader = namedtuple(
+    "RowFileHeader", ["row_index", "height", "row_length", "mask"]
+)
+
+
+def create_row_file(
+    file_name, row_index, row_length, height=1, mask=MIXED_MASKS
+):
+    """Create (or truncate) a row file and write its header."""
+    with open(file_name, "wb") as file:
+        file.write(HEADER.pack(MAGIC, row_index, height, row_length, 0, mask))
+
+
+def read_header(file_name):
+    with open(file_name, "rb") as file:
+        data = file.read(HEADER.size)
+    if len(data) < HEADER.size:
+        raise ValueError(f"{file_name} is not a row file (too short).")
+    magic, row_index, height, row_length, _, mask = HEADER.unpack(data)
+    if magic != MAGIC:
+        raise ValueError(f"{file_name} is not a row file (bad magic).")
+    return RowFileHeader(row_index, height, row_length, mask)
+
+
+def write_row_file(
+    file_name,
+    row_bytes,
+    row_length,
+    row_index=0,
+    height=1,
+    mask=MIXED_MASKS,
+    sync=False,
+):
+    """Write a complete row file under a temporary name and rename it into
+    place, so readers see either the whole file or none of it. With sync
+    the data is fsynced before the rename."""
+    temp_name = f"{file_name}.tmp{os.getpid()}"
+    with open(temp_name, "wb") as file:
+        file.write(HEADER.pack(MAGIC, row_index, height, row_length, 0, mask))
+        file.write(row_bytes)
+        if sync:
+            file.flush()
+            os.fsync(file.fileno())
+    os.replace(temp_name, file_name)
+
+
+def rows_to_bytes(records):
+    """Pack records (flat lists of cell values) into one bytes object."""
+    return bytes(value for record in records for value in record)
+
+
+def append_rows(file_name, records):
+    """Append records with a single buffered write."""
+    if not records:
+        return
+    with open(file_name, "ab") as file:
+        file.write(rows_to_bytes(records))
+
+
+def load_rows(file_name):
+    """Memory-map the records of a row file.
+
+    Returns a read-only uint8 array of shape (records, row_length) for
+    single row files and (records, height, row_length) otherwise.
+    """
+    header = read_header(file_name)
+    record_size = header.height * header.row_length
+    with open(file_name, "rb") as file:
+        file.seek(0, 2)
+        size = file.tell() - HEADER.size
+    count = size // record_size
+    if count == 0:
+        return np.zeros((0,) + _record_shape(header), dtype=np.uint8)
+    return np.memmap(
+        file_name,
+        dtype=np.uint8,
+        mode="r",
+        offset=HEADER.size,
+        shape=(count,) + _record_shape(header),
+    )
+
+
+def _record_shape(header):
+    if header.height == 1:
+        return (header.row_length,)
+    return (header.height, header.row_length)